@@ -6,6 +6,7 @@ from tqdm.auto import tqdm
 from instanseg.utils.metrics import _robust_average_precision, _robust_f1_mean_calculator
 
 from instanseg.utils.augmentations import Augmentations
+from instanseg.utils.data_loader import LazyImage
 import time
 
 from instanseg.utils.utils import show_images
@@ -554,6 +555,13 @@ class Segmentation_Dataset():
         label = self.Y[i]
         meta = self.metadata[i]
 
+        # Path-backed (lazy) items are decoded here, i.e. in the DataLoader
+        # worker, so the main process never holds the full decoded dataset.
+        if isinstance(data, LazyImage):
+            data = data.load()
+        if isinstance(label, LazyImage):
+            label = label.load()
+
         if self.common_transforms:
             data, label = self.Augmenter(data, label, meta)
 
@@ -6,7 +6,7 @@ import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 
-from instanseg.utils.pytorch_utils import torch_sparse_onehot, torch_fastremap, remap_values, torch_onehot, _sparse_mm_dense
+from instanseg.utils.pytorch_utils import torch_sparse_onehot, torch_fastremap, remap_values, torch_onehot, _row_sums, _sparse_mm_dense
 
 def get_intersection_over_union(label: torch.Tensor, return_lab: bool = True) -> torch.Tensor:
 
@@ -30,7 +30,7 @@ def get_intersection_over_nucleus_area(label: torch.Tensor, return_lab: bool = F
     nuclei_onehot = torch_sparse_onehot(label[0, 0], flatten=True)[0]
     cell_onehot = torch_sparse_onehot(label[0, 1], flatten=True)[0]
     intersection = _sparse_mm_dense(nuclei_onehot, cell_onehot)
-    sparse_sum1 = torch.sparse.sum(nuclei_onehot, dim=(1,))[None].to_dense()
+    sparse_sum1 = _row_sums(nuclei_onehot)[None]
     nuclei_area = sparse_sum1.T
 
     if return_lab:
@@ -49,7 +49,7 @@ def get_intersection_over_cell_area(label: torch.Tensor, return_lab = False) ->
     nuclei_onehot = torch_sparse_onehot(label[0, 0], flatten=True)[0]
     cell_onehot = torch_sparse_onehot(label[0, 1], flatten=True)[0]
     intersection = _sparse_mm_dense(cell_onehot, nuclei_onehot)
-    sparse_sum1 = torch.sparse.sum(cell_onehot, dim=(1,))[None].to_dense()
+    sparse_sum1 = _row_sums(cell_onehot)[None]
     cell_area = sparse_sum1.T
     if return_lab:
         return ((intersection / cell_area)), label
@@ -226,7 +226,7 @@ def get_mean_object_features(image: torch.Tensor, label: torch.Tensor) -> torch.
     
     sparse_onehot = torch_sparse_onehot(label, flatten=True)[0]
     out = torch.mm(sparse_onehot, image.flatten(1).T)  # object features
-    sums = torch.sparse.sum(sparse_onehot, dim=(1,)).to_dense()  # object areas
+    sums = _row_sums(sparse_onehot)  # object areas
     out = out / sums[None].T  # mean object features
     return out
 
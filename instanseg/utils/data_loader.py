@@ -1,70 +1,155 @@
 
+import functools
 import numpy as np
+import threading
 import warnings
 
-def _keep_images(item, args):
-
-    #args.source_dataset = str(args.source_dataset).lower().replace("[","").replace("]","").replace("'","").split(",")
+# Open zip handles for archived datasets, shared across get_image calls so the
+# central directory is parsed once per archive. Reads are serialized by the
+# lock: a shared ZipFile seeks its underlying file object, so concurrent
+# member reads from the decode thread pool would interleave.
+_zip_handles = {}
+_zip_lock = threading.Lock()
+
+# Pixel-data keys excluded from the per-item metadata dicts. A frozenset makes
+# the per-key membership check a hash lookup instead of a tuple scan (and drops
+# the raw 'masks' array, which has no business being carried as metadata).
+_METADATA_DROP_KEYS = frozenset(('image', 'cell_masks', 'nucleus_masks', 'class_masks', 'masks'))
+
+def _normalize_source_set(source_dataset):
+    """Normalize a source_dataset spec ("all", a name, a bracketed string, or a
+    list of names) to a lowercased frozenset so membership checks are O(1)."""
+    if isinstance(source_dataset, frozenset):
+        return source_dataset
+    if isinstance(source_dataset, (list, tuple, set)):
+        return frozenset(str(s).lower() for s in source_dataset)
+    s = str(source_dataset).lower()
+    if "[" in s or "," in s:
+        return frozenset(t.strip() for t in s.replace("[", "").replace("]", "").replace("'", "").split(",") if t.strip())
+    return frozenset((s,))
+
+
+def _get_source_set(args):
+    """Parsed source set for `args`, memoized on the args object so the string
+    scans in _normalize_source_set run once per configuration, not per item."""
+    if not hasattr(args, '_source_set'):
+        args._source_set = _normalize_source_set(args.source_dataset)
+    return args._source_set
+
+
+def _make_keep_pred(args):
+    """Build a filter predicate specialized for this run's args.
+
+    The generic filter re-tests four conditions per item even though most of
+    them are fixed for a given configuration (source set, target segmentation,
+    modality filter). Here the dead branches are resolved once, so the returned
+    predicate only evaluates the checks that can actually vary per item."""
+    source_set = _get_source_set(args)
+    check_source = "all" not in source_set
+    target_segmentation = args.target_segmentation
+    if target_segmentation == "N":
+        needed_masks = "nucleus_masks"
+    elif target_segmentation == "C":
+        needed_masks = "cell_masks"
+    else:
+        needed_masks = None
+    modality_filter = getattr(args, 'modality_filter', None)
+    modality = modality_filter.lower() if modality_filter else None
+
+    def pred(item):
+        if item.get('parent_dataset', '').lower() == "bsst265":
+            item['image_modality'] = "Fluorescence" #tmp hack for BSST265
+
+        if check_source and item['parent_dataset'].lower() not in source_set:
+            return False  # remove items that are not of the desired dataset
+        if item.get('duplicate'):  # remove items that are duplicates
+            return False
+        if needed_masks is not None and needed_masks not in item:
+            return False
+        if modality is not None and item.get('image_modality', '').lower() != modality:
+            return False
+        return True
 
-    if item.get('parent_dataset', '').lower().lower() == "bsst265":
-        item['image_modality'] = "Fluorescence" #tmp hack for BSST265
+    return pred
 
 
-    if args.source_dataset != ["all"] and item[
-        'parent_dataset'].lower() not in args.source_dataset:  # remove items that are not of the desired dataset
-        return False
-    elif 'duplicate' in item.keys() and item['duplicate']:  # remove items that are duplicates
-        return False
-    elif args.target_segmentation == "N" and "nucleus_masks" not in item.keys():
-        return False
-    elif args.target_segmentation == "C" and "cell_masks" not in item.keys():
-        return False
-    elif getattr(args, 'modality_filter', None) and item.get('image_modality', '').lower() != args.modality_filter.lower():
-        return False
-    else:
-        return True
+def _keep_images(item, args):
+    if not hasattr(args, '_keep_pred'):
+        args._keep_pred = _make_keep_pred(args)
+    return args._keep_pred(item)
     
  
-def _format_labels(item,target_segmentation):
-            
+def _keep_images_mask(items, args):
+    """Vectorized _keep_images over a whole item list.
+
+    Collapses the per-item branchy filter into a handful of NumPy boolean
+    operations; _keep_images stays as the scalar reference implementation.
+    Returns a boolean mask aligned with `items`."""
+    source_set = _get_source_set(args)
+
+    parents = np.array([str(item.get('parent_dataset', '')).lower() for item in items], dtype=object)
+    for i in np.nonzero(parents == "bsst265")[0]:
+        items[i]['image_modality'] = "Fluorescence"  # tmp hack for BSST265
+
+    mask = np.ones(len(items), dtype=bool)
+    if "all" not in source_set:
+        mask &= np.isin(parents, list(source_set))
+    mask &= ~np.array([bool(item.get('duplicate', False)) for item in items], dtype=bool)
+    if args.target_segmentation == "N":
+        mask &= np.array(["nucleus_masks" in item for item in items], dtype=bool)
+    elif args.target_segmentation == "C":
+        mask &= np.array(["cell_masks" in item for item in items], dtype=bool)
+    modality_filter = getattr(args, 'modality_filter', None)
+    if modality_filter:
+        modalities = np.array([str(item.get('image_modality', '')).lower() for item in items], dtype=object)
+        mask &= (modalities == modality_filter.lower())
+    return mask
+
+
+def _format_labels(item,target_segmentation, data_path = None):
+
     if "cell_masks" in item.keys():
-        item["cell_masks"] = get_image(item["cell_masks"])
-    
+        item["cell_masks"] = get_image(item["cell_masks"], data_path = data_path)
+
     if "nucleus_masks" in item.keys():
-        item["nucleus_masks"] = get_image(item["nucleus_masks"])
- 
+        item["nucleus_masks"] = get_image(item["nucleus_masks"], data_path = data_path)
+
     elif "masks" in item.keys():
-        item["nucleus_masks"] = get_image(item["masks"])
+        item["nucleus_masks"] = get_image(item["masks"], data_path = data_path)
     
     if target_segmentation == "N":
         if "nucleus_masks" not in item.keys():
             c,h,w = item['image'].shape
-            labels = np.zeros((h,w)) -1
+            # np.full writes the buffer once with the right dtype, instead of
+            # zeroing a float64 array and rewriting it via the subtraction.
+            labels = np.full((h,w), -1, dtype=np.int32)
         else:
             labels = item["nucleus_masks"]
     elif target_segmentation == "C":
         if "cell_masks" not in item.keys():
             c,h,w = item['image'].shape
-            labels = np.zeros((h,w)) -1
+            labels = np.full((h,w), -1, dtype=np.int32)
         else:
             labels = item["cell_masks"]
     elif "N" in target_segmentation and "C" in target_segmentation:
+            # Write each plane straight into the pre-allocated int32 output —
+            # np.stack on top of astype/sentinel temporaries moves the same
+            # bytes up to four times on this purely memory-bound path.
             if "nucleus_masks" in item.keys() and "cell_masks" in item.keys():
-                labels = np.stack((item["nucleus_masks"], item["cell_masks"]))
+                nucleus_masks = np.asarray(item["nucleus_masks"])
+                labels = np.empty((2,) + nucleus_masks.shape, dtype=np.int32)
+                labels[0] = nucleus_masks
+                labels[1] = item["cell_masks"]
             elif "nucleus_masks" in item.keys() and "cell_masks" not in item.keys():
-                labels = item['nucleus_masks']
-                if isinstance(labels, np.ndarray):
-                    labels = labels.astype(np.int32)
-                else:
-                    labels = np.array(labels).astype(np.int32)
-                labels = np.stack((labels, np.zeros_like(labels) - 1))
+                nucleus_masks = np.asarray(item['nucleus_masks'])
+                labels = np.empty((2,) + nucleus_masks.shape, dtype=np.int32)
+                labels[0] = nucleus_masks
+                labels[1] = -1
             elif "nucleus_masks" not in item.keys() and "cell_masks" in item.keys():
-                labels = item['cell_masks']
-                if isinstance(labels, np.ndarray):
-                    labels = labels.astype(np.int32)
-                else:
-                    labels = np.array(labels).astype(np.int32)
-                labels = np.stack((np.zeros_like(labels) - 1, labels))
+                cell_masks = np.asarray(item['cell_masks'])
+                labels = np.empty((2,) + cell_masks.shape, dtype=np.int32)
+                labels[0] = -1
+                labels[1] = cell_masks
             else:
                 raise NotImplementedError("No labels found")
     else:
@@ -74,8 +159,51 @@ def _format_labels(item,target_segmentation):
  
 
 
+class LazyImage:
+    """Lightweight handle for a path-backed dataset image.
+
+    Stores only the path token (plus the dataset root), so building the dataset
+    lists costs O(paths) RAM instead of O(decoded pixels). Pixels are decoded on
+    first use via ``load()`` (or ``np.asarray``) — for training this happens in
+    the DataLoader worker that touches the item, not in the main process.
+
+    A zero-argument ``loader`` callable can be given instead of a path, which is
+    used to defer composite results (e.g. stacked label maps)."""
+
+    __slots__ = ("img_object", "data_path", "_loader")
+
+    def __init__(self, img_object = None, data_path = None, loader = None):
+        self.img_object = img_object
+        self.data_path = data_path
+        self._loader = loader
+
+    def load(self):
+        if self._loader is not None:
+            return self._loader()
+        return get_image(self.img_object, data_path = self.data_path)
+
+    @property
+    def shape(self):
+        if self._loader is not None:
+            return self.load().shape
+        import tifffile
+        import os
+        data_path = self.data_path if self.data_path is not None else os.environ["INSTANSEG_DATASET_PATH"]
+        with tifffile.TiffFile(os.path.join(data_path, self.img_object)) as tif:
+            # series[0], not pages[0]: a channel-first stack is one page per
+            # channel, and the page shape would drop the leading axis.
+            return tuple(tif.series[0].shape)
+
+    def __array__(self, dtype = None):
+        arr = np.asarray(self.load())
+        if dtype is not None:
+            arr = arr.astype(dtype)
+        return arr
+
+
 def export_dataset_dict_as_folder(dataset,destination = "benchmarking_data"):
     from collections import defaultdict
+    from concurrent.futures import ThreadPoolExecutor
     from tqdm import tqdm
     import pandas as pd
     import torch
@@ -89,6 +217,9 @@ def export_dataset_dict_as_folder(dataset,destination = "benchmarking_data"):
 
     dataset_dfs = defaultdict(lambda: defaultdict(lambda: list()))
 
+    created_dirs = set()
+    writes = []
+
     for fold_name, fold in dataset.items():
         for i, data_info in tqdm(enumerate(fold), ncols=100, total=len(fold)):
             img = data_info['image']
@@ -100,48 +231,167 @@ def export_dataset_dict_as_folder(dataset,destination = "benchmarking_data"):
             else:
                 mask = data_info['nucleus_masks']
             storage_folder = os.path.join(expanded_datasets, dataset_name, fold_name)
-            if not os.path.exists(storage_folder):
-                os.makedirs(storage_folder)
-            tifffile.imwrite(os.path.join(storage_folder, f"img{i}.tiff"), _move_channel_axis(img))
-            tifffile.imwrite(os.path.join(storage_folder, f"img{i}_mask.tiff"), mask)
+            if storage_folder not in created_dirs:
+                os.makedirs(storage_folder, exist_ok=True)
+                created_dirs.add(storage_folder)
+            writes.append((os.path.join(storage_folder, f"img{i}.tiff"), _move_channel_axis(img)))
+            writes.append((os.path.join(storage_folder, f"img{i}_mask.tiff"), mask))
             for key in data_info.keys():
                 if key not in ['masks','image', 'nucleus_masks', 'cell_masks']:
                     dataset_dfs[dataset_name][key].append(data_info[key])
             dataset_dfs[dataset_name]["ID"].append(i)
 
+    # Flush through a thread pool — tifffile releases the GIL during encode, so
+    # writes scale with disk bandwidth instead of running back to back.
+    with ThreadPoolExecutor(max_workers=min(16, os.cpu_count())) as pool:
+        list(tqdm(pool.map(lambda w: tifffile.imwrite(*w), writes), ncols=100, total=len(writes)))
+
 
     for df_name, df in dataset_dfs.items():
         print(df_name)
         pd.DataFrame(df).to_csv(os.path.join(expanded_datasets, df_name, f"{df_name}_metadata.csv"))
 
 
-def get_image(img_object):
+def _decode_tiff(img_path, direct_io = False):
+    """Decode a TIFF file from disk.
+
+    Prefers imagecodecs.tiff_decode, which releases the GIL for the whole
+    decode so the thread-pooled loader scales across cores. Falls back to
+    tifffile (slower per-call dispatch, but handles every layout) when
+    imagecodecs is missing, cannot decode the file, or the file has more
+    than one page — tiff_decode(index=0) silently returns only the first
+    page, and this repo's own exporter writes channel-first multi-page
+    stacks, so the fast path must be bit-identical to tifffile.imread.
+
+    With ``direct_io=True`` the file is read through a descriptor advised
+    POSIX_FADV_SEQUENTIAL (full kernel readahead for the single-pass pattern)
+    and its pages are dropped afterwards with POSIX_FADV_DONTNEED, so a
+    one-shot dataset load does not churn the page cache. No-op on platforms
+    without posix_fadvise."""
+    import os
+
+    buf = None
+    if direct_io and hasattr(os, "posix_fadvise"):
+        fd = os.open(str(img_path), os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            chunks = []
+            while True:
+                chunk = os.read(fd, 1 << 20)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            buf = b"".join(chunks)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+    try:
+        import imagecodecs
+        import io
+        import tifffile
+        if buf is None:
+            with open(img_path, "rb") as f:
+                buf = f.read()
+        # Header-only parse to count pages; multi-page files take the
+        # tifffile path below so no channel planes are dropped.
+        with tifffile.TiffFile(io.BytesIO(buf)) as tif:
+            single_page = len(tif.pages) == 1
+        if single_page:
+            return imagecodecs.tiff_decode(buf, index=0)
+    except Exception:
+        pass
+
+    import tifffile
+    if buf is not None:
+        import io
+        return tifffile.imread(io.BytesIO(buf))
+    return tifffile.imread(img_path)
+
+
+def _prefetch_paths(paths):
+    """Ask the kernel to start paging in `paths` (POSIX_FADV_WILLNEED).
+
+    The advise calls return immediately — readahead proceeds in the kernel
+    while Python is still busy building lists / dispatching decodes, so the
+    subsequent reads mostly hit the page cache. No-op where posix_fadvise is
+    unavailable."""
+    import os
+    if not hasattr(os, "posix_fadvise"):
+        return
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _advise(path):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        pool.map(_advise, paths)
+
+
+@functools.lru_cache(maxsize=512)
+def _decode_tiff_cached(path_str):
+    """Bounded memo of decoded arrays keyed by resolved path, so masks and
+    small images that are requested repeatedly (e.g. across epoch rebuilds)
+    skip the open + decode."""
+    return _decode_tiff(path_str)
+
+
+def clear_image_cache():
+    """Drop the decoded-image memo held by get_image (for test isolation)."""
+    _decode_tiff_cached.cache_clear()
+
+
+def get_image(img_object, data_path = None, direct_io = False):
     import tifffile
     import os
     from pathlib import Path
 
     if isinstance(img_object, (str, Path)):
 
-        data_path = os.environ["INSTANSEG_DATASET_PATH"]
+        if data_path is None:
+            data_path = os.environ["INSTANSEG_DATASET_PATH"]
 
         img_path = Path(os.path.join(data_path,img_object))
 
         if Path(img_path).exists():
-            img = tifffile.imread(img_path)
-            return img
+            if direct_io:
+                # One-shot sweep: bypass the memo so the pages (and the cache
+                # slot) aren't held for data that won't be re-read.
+                return _decode_tiff(img_path, direct_io = True)
+            return _decode_tiff_cached(str(img_path))
         else:
-           
-            if Path(str(Path(img_path).parents[1]) + ".zip").exists():
-                import shutil
-                import os
-                print("Inflating zip file")
 
-                print((str(Path(img_path).parents[1]) + ".zip"))
+            parent_zip = str(Path(img_path).parents[1]) + ".zip"
+            if Path(parent_zip).exists():
+                import zipfile
+                # Read just the requested member instead of inflating the whole
+                # archive to disk: O(one file) I/O rather than O(archive).
+                member = Path(img_path).relative_to(Path(img_path).parents[2]).as_posix()
+                with _zip_lock:
+                    zf = _zip_handles.get(parent_zip)
+                    if zf is None:
+                        zf = zipfile.ZipFile(parent_zip)
+                        _zip_handles[parent_zip] = zf
+                    try:
+                        with zf.open(member) as f:
+                            return tifffile.imread(f)
+                    except KeyError:
+                        # Member layout differs from the on-disk convention —
+                        # fall back to inflating the archive once.
+                        import shutil
+                        print("Inflating zip file")
+                        print(parent_zip)
+                        shutil.unpack_archive(parent_zip, Path(img_path).parents[2])
 
-                shutil.unpack_archive(str(Path(img_path).parents[1]) + ".zip", Path(img_path).parents[2])
-            
             #breakpoint()
-            img = tifffile.imread(img_path)
+            img = _decode_tiff(img_path)
             return img
     else:
         return img_object
@@ -157,18 +407,17 @@ def _read_images_from_path(data_path= "../datasets",
                           ):
     
     from pathlib import Path
+    from concurrent.futures import ThreadPoolExecutor
     import os
-    import skimage.io
+    import tifffile
 
     datasets_available = sorted(os.listdir(data_path))
     print("Datasets available ", datasets_available)
 
-    source_dataset = args.source_dataset
-
     assert len(sets) !=2, "Only one set can be loaded at a time"
     data_dicts = {}
 
-    source_dataset = str(args.source_dataset).lower().replace("[","").replace("]","").replace("'","").split(",")
+    source_dataset = _get_source_set(args)
 
 
     for folder in datasets_available:
@@ -179,22 +428,26 @@ def _read_images_from_path(data_path= "../datasets",
                 if _set not in data_dicts.keys():
                     data_dicts[_set] = [[],[],[]]
 
-                for image_str in sorted(os.listdir(dataset_path / f"{_set}")):
-                    if "mask" in image_str:
-                        continue
-                    image = skimage.io.imread(dataset_path / f"{_set}/{image_str}")
-                    
-
-                    mask_str = image_str.replace(".tiff","_mask.tiff")
-
-                    mask = skimage.io.imread(dataset_path / f"{_set}/{mask_str}")
-
-
+                # scandir yields name and absolute path in one syscall batch,
+                # instead of listdir + a Path join (string re-parse) per file.
+                with os.scandir(dataset_path / f"{_set}") as it:
+                    entries = sorted(((e.name, e.path) for e in it if "mask" not in e.name),
+                                     key=lambda t: t[0])
+
+                def _load_pair(entry, folder=folder):
+                    # tifffile directly: skimage.io adds a plugin-dispatch layer
+                    # per call that dominates when looping over many files.
+                    image_str, image_path = entry
+                    image = tifffile.imread(image_path)
+                    mask = tifffile.imread(image_path.replace(".tiff", "_mask.tiff"))
                     meta = {"parent_dataset": folder, "modality": "Brightfield", "pixel_size": None, "name": image_str}
+                    return image, mask, meta
 
-                    data_dicts[_set][0].append(image)
-                    data_dicts[_set][1].append(mask)
-                    data_dicts[_set][2].append(meta)
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+                    for image, mask, meta in pool.map(_load_pair, entries):
+                        data_dicts[_set][0].append(image)
+                        data_dicts[_set][1].append(mask)
+                        data_dicts[_set][2].append(meta)
                   #  breakpoint()
 
 
@@ -208,10 +461,103 @@ def _read_images_from_path(data_path= "../datasets",
    # breakpoint()
 
 
-def _read_images_from_pth(data_path= "../datasets", dataset = "segmentation", data_slice = None, dummy = False, args = None, sets = ["Train","Validation"], complete_dataset = None):
+def convert_pth_dataset_to_arrow(path_of_pth, path_of_arrow = None):
+    """One-shot converter from the pickled .pth dataset dict to an Arrow IPC file.
+
+    The Arrow file holds one row per item: the fields the filter depends on
+    (split, parent_dataset, duplicate, image_modality, mask presence) as plain
+    columns, and the full item dict as a pickled binary payload. Loading then
+    memory-maps the file (near-instant, O(page) RAM), filters with vectorized
+    pyarrow.compute kernels, and unpickles only the rows that survive."""
+    import os
+    import pickle
+    import pyarrow as pa
+    import torch
+
+    complete_dataset = torch.load(path_of_pth, weights_only=False)
+
+    cols = {"split": [], "parent_dataset": [], "duplicate": [],
+            "image_modality": [], "has_nucleus_masks": [], "has_cell_masks": [],
+            "item": []}
+    for _set, items in complete_dataset.items():
+        for item in items:
+            parent = str(item.get("parent_dataset", ""))
+            modality = str(item.get("image_modality", ""))
+            if parent.lower() == "bsst265":
+                modality = "Fluorescence"  # mirror the _keep_images hack
+            cols["split"].append(_set)
+            cols["parent_dataset"].append(parent)
+            cols["duplicate"].append(bool(item.get("duplicate", False)))
+            cols["image_modality"].append(modality)
+            cols["has_nucleus_masks"].append("nucleus_masks" in item)
+            cols["has_cell_masks"].append("cell_masks" in item)
+            cols["item"].append(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+
+    table = pa.table({"split": pa.array(cols["split"]),
+                      "parent_dataset": pa.array(cols["parent_dataset"]),
+                      "duplicate": pa.array(cols["duplicate"]),
+                      "image_modality": pa.array(cols["image_modality"]),
+                      "has_nucleus_masks": pa.array(cols["has_nucleus_masks"]),
+                      "has_cell_masks": pa.array(cols["has_cell_masks"]),
+                      "item": pa.array(cols["item"], type=pa.large_binary())})
+
+    if path_of_arrow is None:
+        path_of_arrow = os.path.splitext(str(path_of_pth))[0] + ".arrow"
+    with pa.OSFile(str(path_of_arrow), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path_of_arrow
+
+
+def _read_kept_from_arrow(path_of_arrow, _set, args, data_slice):
+    """Memory-map an Arrow dataset file and return the filtered items for one
+    split. Mirrors _keep_images, but as vectorized pyarrow.compute kernels."""
+    import pickle
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    source = pa.memory_map(str(path_of_arrow))
+    table = pa.ipc.RecordBatchFileReader(source).read_all()
+
+    mask = pc.equal(table["split"], _set)
+    source_set = _get_source_set(args)
+    if "all" not in source_set:
+        mask = pc.and_(mask, pc.is_in(pc.utf8_lower(table["parent_dataset"]),
+                                      value_set=pa.array(sorted(source_set))))
+    mask = pc.and_(mask, pc.invert(table["duplicate"]))
+    if args.target_segmentation == "N":
+        mask = pc.and_(mask, table["has_nucleus_masks"])
+    elif args.target_segmentation == "C":
+        mask = pc.and_(mask, table["has_cell_masks"])
+    modality_filter = getattr(args, "modality_filter", None)
+    if modality_filter:
+        mask = pc.and_(mask, pc.equal(pc.utf8_lower(table["image_modality"]),
+                                      modality_filter.lower()))
+
+    kept_rows = table.filter(mask)["item"]
+    if data_slice is not None:
+        kept_rows = kept_rows.slice(0, data_slice)
+
+    kept = [pickle.loads(buf.as_py()) for buf in kept_rows]
+    for item in kept:
+        if str(item.get("parent_dataset", "")).lower() == "bsst265":
+            item["image_modality"] = "Fluorescence"  # keep parity with _keep_images
+    return kept
+
+
+def _read_images_from_pth(data_path= "../datasets", dataset = "segmentation", data_slice = None, dummy = False, args = None, sets = ["Train","Validation"], complete_dataset = None, lazy = False):
     from pathlib import Path
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+    import hashlib
+    import importlib.util
+    import tempfile
     import torch
-    import os 
+    import os
+
+    cache_dir = None
+    cache_tag = None
+    kept_cache = {}
 
     if complete_dataset is None:
         if not os.environ.get("INSTANSEG_DATASET_PATH"):
@@ -249,23 +595,68 @@ def _read_images_from_pth(data_path= "../datasets", dataset = "segmentation", da
             # Only fall back to the monolith if some requested source isn't covered by a part.
             load_monolith = not all(s in parts_by_stem for s in requested)
 
+        # A sibling .arrow file (see convert_pth_dataset_to_arrow) is preferred
+        # over the pickle: it is memory-mapped rather than read into RAM and
+        # filtered with vectorized kernels rather than per-item Python calls.
+        path_of_arrow = os.path.splitext(path_of_pth)[0] + ".arrow"
+        if os.path.exists(path_of_arrow) and importlib.util.find_spec("pyarrow") is not None:
+            print("Loading dataset from ", os.path.abspath(path_of_arrow))
+            for _set in sets:
+                kept_cache[_set] = _read_kept_from_arrow(path_of_arrow, _set, args, data_slice)
+            load_monolith = False
+            parts_to_load = []
+
+        # Filtered-set disk cache: keyed on the source files (path + mtime) and
+        # every argument the filter depends on, so a hit means re-running
+        # _keep_images would give the same answer. On a full hit we skip both
+        # the torch.load of the (large) pth files and the O(N) filter pass.
+        src_files = [p for p in [path_of_pth] * load_monolith + [str(p) for p in parts_to_load]
+                     if os.path.exists(p)]
+        if src_files:
+            key = repr((sorted((os.path.abspath(p), os.path.getmtime(p)) for p in src_files),
+                        sorted(_get_source_set(args)) if args is not None else ["all"],
+                        getattr(args, "target_segmentation", None),
+                        getattr(args, "modality_filter", None),
+                        data_slice))
+            cache_tag = hashlib.sha1(key.encode()).hexdigest()[:16]
+            cache_dir = Path(data_path) / ".filter_cache"
+            for _set in sets:
+                cache_file = cache_dir / f"{_set}_{cache_tag}.pth"
+                if cache_file.exists():
+                    kept_cache[_set] = torch.load(str(cache_file), weights_only=False)
+            if all(_set in kept_cache for _set in sets):
+                print(f"Using cached filtered dataset ({cache_dir}, tag {cache_tag})")
+                complete_dataset = {}
+                load_monolith = False
+                parts_to_load = []
+
         complete_dataset = {}
         if load_monolith:
             print("Loading dataset from ", os.path.abspath(path_of_pth))
             if os.path.exists(path_of_pth):
                 try:
-                    complete_dataset = torch.load(path_of_pth, weights_only=False)
-                except:
-                    complete_dataset = torch.load(path_of_pth)
-        else:
+                    # mmap=True (PyTorch 2.1+, zipfile-format checkpoints) maps
+                    # tensor storages instead of copying the file into RAM;
+                    # pages fault in on first touch and the page cache is
+                    # shared across local ranks.
+                    complete_dataset = torch.load(path_of_pth, weights_only=False, mmap=True)
+                except Exception:
+                    try:
+                        complete_dataset = torch.load(path_of_pth, weights_only=False)
+                    except:
+                        complete_dataset = torch.load(path_of_pth)
+        elif requested is not None:
             print(f"Skipping monolithic dataset (requested sources covered by parts: {sorted(requested)})")
 
         for part_path in parts_to_load:
             print(f"Merging dataset part from {part_path}")
             try:
-                part = torch.load(str(part_path), weights_only=False)
-            except:
-                part = torch.load(str(part_path))
+                part = torch.load(str(part_path), weights_only=False, mmap=True)
+            except Exception:
+                try:
+                    part = torch.load(str(part_path), weights_only=False)
+                except:
+                    part = torch.load(str(part_path))
             for _set, items in part.items():
                 complete_dataset.setdefault(_set, []).extend(items)
     
@@ -273,15 +664,60 @@ def _read_images_from_pth(data_path= "../datasets", dataset = "segmentation", da
     data_dicts = {}
 
     for _set in sets:
-        print("Datasets available in ", _set)
-        unique_values, counts = np.unique([item['parent_dataset'] for item in complete_dataset[_set]], return_counts=True)
-        print(set((k.item(), v.item()) for k, v in zip(unique_values, counts)))
-
         data_dicts[_set] = []
-        images_local = [get_image(item['image']) for item in complete_dataset[_set] if _keep_images(item, args)][:data_slice]
- 
-        labels_local = [_format_labels(item,target_segmentation = args.target_segmentation) for item in complete_dataset[_set] if _keep_images(item, args)][:data_slice]
-        metadata = [{k: v for k, v in item.items() if k not in ('image', 'cell_masks','nucleus_masks', 'class_masks')} for item in complete_dataset[_set] if _keep_images(item, args)][:data_slice]
+
+        if _set in kept_cache:
+            kept = kept_cache[_set]
+        else:
+            print("Datasets available in ", _set)
+            unique_values, counts = np.unique([item['parent_dataset'] for item in complete_dataset[_set]], return_counts=True)
+            print(set((k.item(), v.item()) for k, v in zip(unique_values, counts)))
+
+            keep_mask = _keep_images_mask(complete_dataset[_set], args)
+            kept = [item for item, keep in zip(complete_dataset[_set], keep_mask) if keep][:data_slice]
+
+            # Only local rank 0 populates the cache, so multi-rank runs don't
+            # write (or re-filter into) the same file G times.
+            if cache_tag is not None and os.environ.get("LOCAL_RANK", "0") == "0":
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=str(cache_dir), suffix=".tmp")
+                os.close(fd)
+                torch.save(kept, tmp_path)
+                os.replace(tmp_path, str(cache_dir / f"{_set}_{cache_tag}.pth"))
+
+        data_path_local = os.environ.get("INSTANSEG_DATASET_PATH")
+
+        if lazy:
+            # Keep only path handles; decoding is deferred to whichever process
+            # first touches the item (the DataLoader workers during training),
+            # so peak RAM stays O(batch * image) instead of O(dataset).
+            images_local = []
+            labels_local = []
+            for item in kept:
+                if isinstance(item['image'], (str, Path)):
+                    item = dict(item)
+                    item['image'] = LazyImage(item['image'], data_path = data_path_local)
+                images_local.append(item['image'])
+                # _format_labels gets its own shallow copy so decoded masks are
+                # not pinned into the shared item dicts.
+                labels_local.append(LazyImage(loader = partial(_format_labels, dict(item), args.target_segmentation, data_path_local)))
+        else:
+            # Kick off kernel readahead for every file this split will touch,
+            # so the decode pool below mostly reads from the page cache.
+            if data_path_local is not None:
+                _prefetch_paths([os.path.join(data_path_local, item[key]) for item in kept
+                                 for key in ('image', 'nucleus_masks', 'cell_masks', 'masks')
+                                 if isinstance(item.get(key), str)])
+
+            # Decode TIFFs across a thread pool: tifffile releases the GIL during
+            # decode, so I/O and decompression of different files overlap. The
+            # dataset root is resolved once here rather than per call in workers.
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+                # direct_io: this is a one-shot sequential sweep over every
+                # image, so advise the kernel accordingly and release the pages.
+                images_local = list(pool.map(lambda item: get_image(item['image'], data_path = data_path_local, direct_io = True), kept))
+                labels_local = list(pool.map(lambda item: _format_labels(item, target_segmentation = args.target_segmentation, data_path = data_path_local), kept))
+        metadata = [{k: v for k, v in item.items() if k not in _METADATA_DROP_KEYS} for item in kept]
 
         data_dicts[_set].extend([images_local,labels_local,metadata])
 
@@ -368,28 +804,28 @@ def get_loaders(train_images_local, train_labels_local, val_images_local, val_la
             rel_freq = np.array(freq) / sum(freq)
             print("Leiden cluster distribution:", cluster_prob)
         else:
-            datasets_train = [meta["parent_dataset"] for meta in train_meta]
-            datasets,counts = np.unique(datasets_train,return_counts=True)
-            dict_datasets = dict(zip(datasets,counts / sum(counts)))
-            freq = [ 1/ dict_datasets[dataset] for dataset in datasets_train]
-            rel_freq = (freq / sum(freq))
-            print(dict_datasets)
+            # Fully-NumPy weighting: return_inverse maps each item to its
+            # dataset's count directly, avoiding the per-item dict lookups.
+            datasets_train = np.array([meta["parent_dataset"] for meta in train_meta], dtype=object)
+            datasets, inverse, counts = np.unique(datasets_train, return_inverse=True, return_counts=True)
+            freq = (counts.sum() / counts)[inverse]
+            rel_freq = freq / freq.sum()
+            print(dict(zip(datasets, counts / counts.sum())))
 
         if args.length_of_epoch is not None:
             train_sampler = WeightedRandomSampler(rel_freq, args.length_of_epoch)
         else:
             train_sampler = WeightedRandomSampler(rel_freq, len(rel_freq))
 
-        datasets_val = [meta["parent_dataset"] for meta in val_meta]
-        datasets,counts = np.unique(datasets_val,return_counts=True)
-        dict_datasets = dict(zip(datasets,counts / sum(counts)))
-        freq = [ 1/ dict_datasets[dataset] for dataset in datasets_val]
-        rel_freq = (freq / sum(freq))
+        datasets_val = np.array([meta["parent_dataset"] for meta in val_meta], dtype=object)
+        datasets, inverse, counts = np.unique(datasets_val, return_inverse=True, return_counts=True)
+        freq = (counts.sum() / counts)[inverse]
+        rel_freq = freq / freq.sum()
 
         if args.length_of_epoch is not None:
             test_sampler = WeightedRandomSampler(rel_freq, args.length_of_eval)
         else:
-            test_sampler = WeightedRandomSampler(rel_freq, len(freq))
+            test_sampler = WeightedRandomSampler(rel_freq, len(rel_freq))
 
 
     # persistent_workers=False: workers are torn down and re-forked each epoch.
@@ -402,11 +838,20 @@ def get_loaders(train_images_local, train_labels_local, val_images_local, val_la
     persistent_workers = getattr(args, "persistent_workers", False)
     loader_kwargs = {}
     if args.num_workers > 0:
-        loader_kwargs["prefetch_factor"] = getattr(args, "prefetch_factor", 2)
+        loader_kwargs["prefetch_factor"] = getattr(args, "prefetch_factor", 4)
+
+    # pin_memory stages batches in page-locked RAM so the H2D copy is async and
+    # overlaps the forward pass. Workers stay fork-spawned: with the dataset
+    # held as in-memory arrays, 'spawn' would pickle the whole dataset into
+    # every worker instead of sharing it copy-on-write.
+    import torch
+    pin_memory = torch.cuda.is_available()
 
     train_loader = DataLoader(train_data, collate_fn=collate_fn, batch_size=args.batch_size, num_workers=args.num_workers,
-                              sampler=train_sampler, persistent_workers=persistent_workers, drop_last=True, **loader_kwargs)
+                              sampler=train_sampler, persistent_workers=persistent_workers, pin_memory=pin_memory,
+                              drop_last=True, **loader_kwargs)
     test_loader = DataLoader(test_data, collate_fn=collate_fn, batch_size=args.batch_size, num_workers=args.num_workers,
-                             sampler=test_sampler, persistent_workers=persistent_workers, drop_last=True, **loader_kwargs)
+                             sampler=test_sampler, persistent_workers=persistent_workers, pin_memory=pin_memory,
+                             drop_last=True, **loader_kwargs)
 
     return train_loader, test_loader
@@ -1,3 +1,5 @@
+import functools
+
 import torch
 import torch.nn.functional as F
 from typing import Tuple, Union
@@ -31,6 +33,17 @@ def remap_values(remapping: torch.Tensor, x: torch.Tensor) -> torch.Tensor:
     x: any shape
     """
 
+    keys, vals = remapping[0], remapping[1]
+    if keys.numel() > 0 and keys.min() >= 0 and keys.max() < (1 << 20):
+        x_min, x_max = torch.aminmax(x)
+        if x_min >= 0 and x_max <= keys.max():
+            # Dense lookup table: one gather per element instead of a
+            # log(N) bucketize per element. Only taken when the key space is
+            # small enough that the table stays a few MB at most.
+            lut = torch.zeros(int(keys.max()) + 1, dtype=vals.dtype, device=vals.device)
+            lut[keys.long()] = vals
+            return lut[x.long().ravel()].reshape(x.shape)
+
     sorted_remapping = remapping[:, remapping[0].argsort()]
     index = torch.bucketize(x.ravel(), sorted_remapping[0])
     return sorted_remapping[1][index].reshape(x.shape)
@@ -88,10 +101,10 @@ def torch_fastremap(x: torch.Tensor) -> torch.Tensor:
         add_one = 1
     else:
         add_one = 0
-    unique_values = torch.unique(x, sorted=True)
-    new_values = torch.arange(len(unique_values), dtype=x.dtype, device=x.device)
-    remapping = torch.stack((unique_values, new_values))
-    return remap_values(remapping, x) + add_one
+    # The inverse indices from a sorted unique() are exactly the compacted
+    # labels, so no second remapping pass over the tensor is needed.
+    _, inverse = torch.unique(x, sorted=True, return_inverse=True)
+    return inverse.view_as(x).to(x.dtype) + add_one
 
 import torch
 
@@ -162,11 +175,15 @@ def torch_onehot(x: torch.Tensor) -> torch.Tensor:
         # Create empty tensor with 0 channels directly (can't reshape non-empty to empty)
         return torch.zeros((1, 0, *x.shape[-2:]), dtype=x.dtype, device=x.device)
     H, W = x.shape[-2:]
-    x = x.view(-1, 1, H, W)
-    x = x.squeeze().view(1, 1, H, W)
-    unique = torch.unique(x[x > 0])
-    x = x.repeat(1, len(unique), 1, 1)
-    return x == unique.unsqueeze(-1).unsqueeze(-1)
+    x = x.reshape(H, W)
+    # unique+inverse relabels to 0..K-1, then scatter writes exactly H*W ones —
+    # the repeat + broadcast-compare it replaces materialized a C,H,W integer
+    # tensor (O(C*H*W) peak memory) just to produce a binary result.
+    unique_values, inverse = torch.unique(x, sorted=True, return_inverse=True)
+    onehot = torch.zeros((unique_values.numel(), H, W), dtype=torch.bool, device=x.device)
+    onehot.scatter_(0, inverse.view(1, H, W), True)
+    onehot = onehot[unique_values > 0]  # drop background / sentinel channels
+    return onehot.unsqueeze(0)
 
 
 def fast_iou(onehot: torch.Tensor, threshold: float = 0.5) -> torch.Tensor:
@@ -190,8 +207,21 @@ def _sparse_mm_dense(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
     such workspace limit). These IoU calls run in per-image postprocessing /
     metrics with no DDP collectives in scope, so a local fallback does not
     desync ranks."""
+    return _sparse_mm_coo(a, b).to_dense()
+
+
+def _sparse_mm_coo(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+    """Sparse-result counterpart of :func:`_sparse_mm_dense`, with the same CPU
+    fallback."""
+    # torch.sparse.mm on COO rebuilds CSR internally on every call; converting
+    # both operands up front keeps the cuSPARSE/MKL SpGEMM fast path. Backends
+    # without CSR support fall through to the plain COO product below.
+    try:
+        return torch.sparse.mm(a.to_sparse_csr(), b.t().to_sparse_csr()).to_sparse_coo()
+    except (RuntimeError, NotImplementedError):
+        pass
     try:
-        return torch.sparse.mm(a, b.T).to_dense()
+        return torch.sparse.mm(a, b.T)
     except RuntimeError as e:
         msg = str(e).lower()
         if not any(k in msg for k in ("insufficient resources", "cusparse", "out of memory")):
@@ -199,20 +229,33 @@ def _sparse_mm_dense(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         device = a.device
-        return torch.sparse.mm(a.cpu().coalesce(), b.cpu().coalesce().T).to_dense().to(device)
+        return torch.sparse.mm(a.cpu().coalesce(), b.cpu().coalesce().T).to(device)
 
 
-def fast_sparse_iou(sparse_onehot: torch.Tensor) -> torch.Tensor:
+def _row_sums(sparse_onehot: torch.Tensor) -> torch.Tensor:
+    """Row sums of a sparse onehot. The values are all ones, so this is just a
+    bincount of the row indices — no segment reduce, no to_dense round trip."""
+    if not sparse_onehot.is_coalesced():
+        sparse_onehot = sparse_onehot.coalesce()
+    return torch.bincount(sparse_onehot.indices()[0], minlength=sparse_onehot.shape[0]).float()
 
-    intersection = _sparse_mm_dense(sparse_onehot, sparse_onehot)
 
-    if torch.isnan(intersection).any() or torch.isinf(intersection).any():
-        print("Warning: Intersection contains NaN or Inf values. This may indicate an issue with the input sparse tensor.")
+def fast_sparse_iou(sparse_onehot: torch.Tensor) -> torch.Tensor:
 
+    # Keep the SpGEMM result sparse: IoU is only nonzero where the
+    # intersection is, so compute v / (area_i + area_j - v) on the nnz values
+    # and scatter them into the dense output. This skips the dense union
+    # matrix (a second N x N allocation) entirely.
+    intersection = _sparse_mm_coo(sparse_onehot, sparse_onehot).coalesce()
+    areas = _row_sums(sparse_onehot)
 
-    sparse_sum = torch.sparse.sum(sparse_onehot, dim=(1,))[None].to_dense()
-    union = sparse_sum.T + sparse_sum - intersection
-    return intersection / union
+    idx = intersection.indices()
+    vals = intersection.values()
+    iou_vals = vals / (areas[idx[0]] + areas[idx[1]] - vals)
+
+    iou = torch.zeros(intersection.shape, device=vals.device, dtype=vals.dtype)
+    iou[idx[0], idx[1]] = iou_vals
+    return iou
 
 def fast_sparse_intersection_over_minimum_area(sparse_onehot: torch.Tensor) -> torch.Tensor:
     """
@@ -231,7 +274,7 @@ def fast_sparse_intersection_over_minimum_area(sparse_onehot: torch.Tensor) -> t
         print("Warning: Intersection contains NaN or Inf values. This may indicate an issue with the input sparse tensor.")
 
     # Compute the area (sum of ones for each row)
-    sparse_sum = torch.sparse.sum(sparse_onehot, dim=(1,)).to_dense()
+    sparse_sum = _row_sums(sparse_onehot)
     
     # Compute the minimum area for each pair
     min_area = torch.min(sparse_sum[:, None], sparse_sum[None, :])
@@ -270,9 +313,20 @@ def instance_wise_edt(x: torch.Tensor, edt_type: str = 'auto') -> torch.Tensor:
         # instance by its own max via a 1-D scatter_reduce over label ids,
         # avoiding the dense [C, H, W] one-hot tensor (O(H*W) vs O(C*H*W) mem).
         labels = x.reshape(H, W).long()
+        if x.is_cuda:
+            # Stage the device-to-host copy through a pinned buffer so it can
+            # overlap with in-flight GPU work; synchronise only once, right
+            # before handing the buffer to edt. `.cpu()` on pageable memory
+            # would serialise the stream immediately instead.
+            host = torch.empty_like(x[0], device="cpu", pin_memory=True)
+            host.copy_(x[0], non_blocking=True)
+            torch.cuda.current_stream(x.device).synchronize()
+            arr = host.numpy()
+        else:
+            arr = x[0].cpu().numpy()
         xedt = torch.from_numpy(
-            edt.edt(x[0].cpu().numpy(), black_border=False)
-        ).to(x.device).reshape(H, W).float()
+            edt.edt(arr, black_border=False)
+        ).to(x.device, non_blocking=True).reshape(H, W).float()
 
         flat_labels = labels.reshape(-1)
         flat_edt = xedt.reshape(-1)
@@ -283,9 +337,10 @@ def instance_wise_edt(x: torch.Tensor, edt_type: str = 'auto') -> torch.Tensor:
         max_per_label.scatter_reduce_(
             0, inv, flat_edt, reduce='amax', include_self=False
         )
-        out = flat_edt / max_per_label[inv].clamp_min(1e-6)
-        out[flat_labels == 0] = 0.0
-        x = out.reshape(H, W)
+        # flat_edt views memory freshly created above, so normalise in place.
+        flat_edt.div_(max_per_label[inv].clamp_min(1e-6))
+        flat_edt[flat_labels == 0] = 0.0
+        x = flat_edt.reshape(H, W)
     else:
         import monai
         x = torch_onehot(x)
@@ -376,30 +431,39 @@ def fast_dual_iou(onehot1: torch.Tensor, onehot2: torch.Tensor) -> torch.Tensor:
     """
     # onehot1 and onehot2 are C1,H,W and C2,H,W
 
-    C1 = onehot1.shape[0]
-    C2 = onehot2.shape[0]
-
-    max_C = max(C1, C2)
+    # The GEMM handles rectangular C1 x C2 directly — no need to zero-pad
+    # both stacks to max(C1, C2). (The old padding also allocated its zeros
+    # on the CPU regardless of the input device.)
+    onehot1 = (onehot1.flatten(1) > 0.5).float()  # onehot should be binary
+    onehot2 = (onehot2.flatten(1) > 0.5).float()
 
-    onehot1 = torch.cat((onehot1, torch.zeros((max_C - C1, *onehot1.shape[1:]))), dim=0)
-    onehot2 = torch.cat((onehot2, torch.zeros((max_C - C2, *onehot2.shape[1:]))), dim=0)
-
-    onehot1 = onehot1.flatten(1)
-    onehot1 = (onehot1 > 0.5).float()  # onehot should be binary
+    intersection = onehot1 @ onehot2.T
+    union = onehot1.sum(1)[None].T + onehot2.sum(1)[None] - intersection
 
-    onehot2 = onehot2.flatten(1)
-    onehot2 = (onehot2 > 0.5).float()
+    return intersection / union
 
-    intersection = onehot1 @ onehot2.T
-    union = (onehot1).sum(1)[None].T + (onehot2).sum(1)[None] - intersection
 
-    return (intersection / union)[:C1, :C2]
+def _coalesced_coo(indices: torch.Tensor, values: torch.Tensor, size) -> torch.Tensor:
+    """Construct a COO tensor from indices already in lexicographic order,
+    marking it coalesced where supported so consumers don't re-sort it."""
+    try:
+        return torch.sparse_coo_tensor(indices, values, size=size, dtype=torch.float32,
+                                       is_coalesced=True)
+    except TypeError:  # older torch without is_coalesced
+        return torch.sparse_coo_tensor(indices, values, size=size, dtype=torch.float32)
 
 
 def torch_sparse_onehot(x: torch.Tensor, flatten: bool = False) -> Tuple[torch.Tensor, torch.Tensor]:
     # x is a labeled image of shape _,_,H,W returns a sparse tensor of shape C,H,W
-    unique_values = torch.unique(x, sorted=True)
-    x = torch_fastremap(x)
+    # One scan: return_inverse already yields the dense relabel that
+    # torch_fastremap would recompute with a second unique + bucketize.
+    unique_values, inverse = torch.unique(x, sorted=True, return_inverse=True)
+    x = inverse.view_as(x)
+    if unique_values[0] > 0:
+        # strictly positive labels: keep them 1-based, as fastremap did.
+        # A negative minimum (the -1 sentinel planes) must not shift, exactly
+        # like fastremap's min() > 0 check.
+        x = x + 1
 
     H, W = x.shape[-2], x.shape[-1]
 
@@ -415,9 +479,13 @@ def torch_sparse_onehot(x: torch.Tensor, flatten: bool = False) -> Tuple[torch.T
         zz = x[xxyy] - 1
         C = x.max().int().item()
 
-       # print(C, H, W, type(C), type(H), type(W))
-        sparse_onehot = torch.sparse_coo_tensor(torch.stack((zz, xxyy)).long(), (torch.ones_like(xxyy).float()),
-                                                size=(int(C), int(H * W)), dtype=torch.float32)
+        # Sort by row (stable, so columns stay ascending within a row): the COO
+        # is then born coalesced, and every downstream torch.sparse.mm skips
+        # its O(nnz log nnz) coalesce before the internal CSR conversion.
+        order = torch.argsort(zz, stable=True)
+        indices = torch.stack((zz[order], xxyy[order])).long()
+        sparse_onehot = _coalesced_coo(indices, torch.ones_like(xxyy, dtype=torch.float32),
+                                       (int(C), int(H * W)))
 
     else:
         if x.max() == 0:
@@ -427,8 +495,10 @@ def torch_sparse_onehot(x: torch.Tensor, flatten: bool = False) -> Tuple[torch.T
         x_temp= torch.nonzero(x > 0).T
         zz = x[x_temp[0], x_temp[1]] - 1
         C = x.max().int().item()
-        sparse_onehot = torch.sparse_coo_tensor(torch.stack((zz, x_temp[0], x_temp[1])).long(), (torch.ones_like(x_temp[0]).float()),
-                                                size=(int(C), int(H), int(W)), dtype=torch.float32)
+        order = torch.argsort(zz, stable=True)
+        indices = torch.stack((zz[order], x_temp[0][order], x_temp[1][order])).long()
+        sparse_onehot = _coalesced_coo(indices, torch.ones_like(x_temp[0], dtype=torch.float32),
+                                       (int(C), int(H), int(W)))
 
     return sparse_onehot, unique_values
 
@@ -443,8 +513,8 @@ def fast_sparse_dual_iou(onehot1: torch.Tensor, onehot2: torch.Tensor) -> torch.
     # onehot1 and onehot2 are C1,H*W and C2,H*W
 
     intersection = _sparse_mm_dense(onehot1, onehot2)
-    sparse_sum1 = torch.sparse.sum(onehot1, dim=(1,))[None].to_dense()
-    sparse_sum2 = torch.sparse.sum(onehot2, dim=(1,))[None].to_dense()
+    sparse_sum1 = _row_sums(onehot1)[None]
+    sparse_sum2 = _row_sums(onehot2)[None]
     union = sparse_sum1.T + sparse_sum2 - intersection
 
     return (intersection / union)
@@ -479,10 +549,22 @@ def match_labels(tile_1: torch.Tensor,tile_2: torch.Tensor,threshold: float = 0.
         else:
             return torch.zeros_like(tile_1), torch.zeros_like(tile_2)
         
-    old_problematic_onehot, old_unique_values = torch_sparse_onehot(tile_1, flatten=True)
-    new_problematic_onehot, new_unique_values = torch_sparse_onehot(tile_2, flatten=True)
+    old_unique_values = torch.unique(tile_1)
+    new_unique_values = torch.unique(tile_2)
+    n1 = int((old_unique_values > 0).sum())
+    n2 = int((new_unique_values > 0).sum())
+
+    if n1 * n2 < 4096:
+        # Small tiles (the common case at tile boundaries): one dense GEMM
+        # beats the sparse machinery of COO build + CSR conversion + SpGEMM
+        # dispatch. torch_onehot's channel order is the sorted nonzero
+        # uniques, matching the sparse path.
+        iou = fast_dual_iou(torch_onehot(tile_1)[0].float(), torch_onehot(tile_2)[0].float())
+    else:
+        old_problematic_onehot, _ = torch_sparse_onehot(tile_1, flatten=True)
+        new_problematic_onehot, _ = torch_sparse_onehot(tile_2, flatten=True)
 
-    iou = fast_sparse_dual_iou(old_problematic_onehot, new_problematic_onehot)
+        iou = fast_sparse_dual_iou(old_problematic_onehot, new_problematic_onehot)
 
     onehot_remapping = torch.nonzero(iou > threshold).T# + 1
 
@@ -493,28 +575,202 @@ def match_labels(tile_1: torch.Tensor,tile_2: torch.Tensor,threshold: float = 0.
 
 
     if onehot_remapping.shape[1] > 0:
-        
-        onehot_remapping = torch.stack((new_unique_values[onehot_remapping[1]], old_unique_values[onehot_remapping[0]]))
-
+        return _apply_label_match(tile_1, tile_2,
+                                  new_unique_values[onehot_remapping[1]],
+                                  old_unique_values[onehot_remapping[0]], strict)
+    else:
         if not strict:
-            mask = torch.isin(tile_2, onehot_remapping[0])
-            tile_2[mask] = remap_values(onehot_remapping, tile_2[mask])
-
             return tile_1, tile_2
         else:
-            tile_1 = tile_1 * torch.isin(tile_1, onehot_remapping[1]).int()
-            tile_2 = tile_2 * torch.isin(tile_2, onehot_remapping[0]).int()
+            return torch.zeros_like(tile_1), torch.zeros_like(tile_2)
 
-            tile_2[tile_2>0] = remap_values(onehot_remapping, tile_2[tile_2>0])
 
-            return tile_1, tile_2
-        
+def _apply_label_match(tile_1: torch.Tensor, tile_2: torch.Tensor,
+                       new_ids: torch.Tensor, old_ids: torch.Tensor, strict: bool):
+    """Rewrite tile_2's matched labels (new_ids -> old_ids) through a LUT.
+
+    Identity LUT in the normal path, so unmatched labels keep their value;
+    zero-default LUT in strict mode, so unmatched objects on both sides drop
+    to background. One gather per tile, no isin / masked scatter.
+    """
+    keys = new_ids.long()
+    vals = old_ids.to(tile_2.dtype)
+
+    if not strict:
+        lut = torch.arange(int(tile_2.max()) + 1, dtype=tile_2.dtype, device=tile_2.device)
+        lut[keys] = vals
+        return tile_1, lut[tile_2.long()]
     else:
-        if not strict:
-            return tile_1, tile_2
-        else:
-            return torch.zeros_like(tile_1), torch.zeros_like(tile_2)
-        
+        lut = torch.zeros(int(tile_2.max()) + 1, dtype=tile_2.dtype, device=tile_2.device)
+        lut[keys] = vals
+        tile_2 = lut[tile_2.long()]
+
+        keep = torch.zeros(int(tile_1.max()) + 1, dtype=torch.bool, device=tile_1.device)
+        keep[old_ids.long()] = True
+        tile_1 = tile_1 * keep[tile_1.long()]
+
+        return tile_1, tile_2
+
+
+def batched_match_labels(pairs, threshold: float = 0.5, strict: bool = False):
+    """Batched :func:`match_labels` over a list of ``(tile_1, tile_2)`` pairs.
+
+    Per-pair calls pay the unique scan, nonzero, COO construction and SpGEMM
+    launch once per pair. Here the pairs share one block-diagonal sparse
+    onehot per side — label rows offset per pair so they cannot collide,
+    pixels concatenated into disjoint column ranges — so a single SpGEMM
+    yields every pairwise intersection at once. Each pair is then remapped
+    exactly as match_labels would.
+    """
+    results = [None] * len(pairs)
+
+    rows1, cols1, rows2, cols2 = [], [], [], []
+    uniqs1, uniqs2 = [], []      # nonzero label values per batched pair
+    batched = []                 # indices into `pairs` that take the batch path
+    row_off1, row_off2 = [0], [0]
+    col_off = 0
+
+    for k, (tile_1, tile_2) in enumerate(pairs):
+        if tile_1.max() == 0 or tile_2.max() == 0:
+            if not strict:
+                results[k] = (tile_1, tile_2)
+            else:
+                results[k] = (torch.zeros_like(tile_1), torch.zeros_like(tile_2))
+            continue
+
+        for tile, rows, cols, uniqs, row_off in (
+                (tile_1, rows1, cols1, uniqs1, row_off1),
+                (tile_2, rows2, cols2, uniqs2, row_off2)):
+            flat = tile.reshape(-1)
+            uniq, inverse = torch.unique(flat, sorted=True, return_inverse=True)
+            has_bg = int(uniq[0] == 0)
+            nz = torch.nonzero(flat > 0).squeeze(1)
+            rows.append(inverse[nz] - has_bg + row_off[-1])
+            cols.append(nz + col_off)
+            uniqs.append(uniq[has_bg:])
+            row_off.append(row_off[-1] + uniq.numel() - has_bg)
+
+        col_off += tile_1.reshape(-1).numel()
+        batched.append(k)
+
+    if not batched:
+        return results
+
+    def _assemble(rows, cols, num_rows):
+        rows = torch.cat(rows)
+        cols = torch.cat(cols)
+        # Row offsets grow with the pair index, so one stable sort by row
+        # yields globally lexicographic indices and a born-coalesced COO.
+        order = torch.argsort(rows, stable=True)
+        indices = torch.stack((rows[order], cols[order])).long()
+        values = torch.ones(indices.shape[1], dtype=torch.float32, device=indices.device)
+        return _coalesced_coo(indices, values, (num_rows, col_off))
+
+    onehot1 = _assemble(rows1, cols1, row_off1[-1])
+    onehot2 = _assemble(rows2, cols2, row_off2[-1])
+
+    intersection = _sparse_mm_coo(onehot1, onehot2).coalesce()
+    areas1 = _row_sums(onehot1)
+    areas2 = _row_sums(onehot2)
+
+    idx = intersection.indices()
+    vals = intersection.values()
+    iou_vals = vals / (areas1[idx[0]] + areas2[idx[1]] - vals)
+    matched = iou_vals > threshold
+    mi, mj = idx[0][matched], idx[1][matched]
+
+    for bk, k in enumerate(batched):
+        tile_1, tile_2 = pairs[k]
+        # The intersection is block diagonal, so this pair's matches are
+        # exactly the entries whose row falls in its tile_1 label range.
+        sel = (mi >= row_off1[bk]) & (mi < row_off1[bk + 1])
+        if not bool(sel.any()):
+            if not strict:
+                results[k] = (tile_1, tile_2)
+            else:
+                results[k] = (torch.zeros_like(tile_1), torch.zeros_like(tile_2))
+            continue
+
+        old_ids = uniqs1[bk][mi[sel] - row_off1[bk]]
+        new_ids = uniqs2[bk][mj[sel] - row_off2[bk]]
+        results[k] = _apply_label_match(tile_1, tile_2, new_ids, old_ids, strict)
+
+    return results
+
+
+def _maybe_compile(fn):
+    """Best-effort ``torch.compile`` for the per-iteration morphology steps.
+
+    Each step is a 3x3 max-pool plus a couple of elementwise ops, so the win is
+    fusing them into one kernel and dropping the Python dispatch paid once per
+    iteration. Compilation is attempted lazily on first call and permanently
+    falls back to eager if the backend is unavailable (e.g. no Triton);
+    disable entirely with INSTANSEG_COMPILE_MORPH=0. Convergence checks like
+    ``torch.equal`` stay in the eager callers — they are graph breaks.
+    """
+    import os
+    if os.environ.get("INSTANSEG_COMPILE_MORPH", "1") != "1" or not hasattr(torch, "compile"):
+        return fn
+
+    state = {"compiled": None, "disabled": False}
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not state["disabled"]:
+            try:
+                if state["compiled"] is None:
+                    state["compiled"] = torch.compile(fn, dynamic=True, fullgraph=False)
+                return state["compiled"](*args, **kwargs)
+            except Exception:
+                state["disabled"] = True
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+@_maybe_compile
+def _cc_step(out: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+    pooled = F.max_pool2d(out, kernel_size=3, stride=1, padding=1)
+    # Fused select instead of the masked gather/scatter (out[mask] = ...),
+    # which materialized an intermediate buffer of mask.sum() elements.
+    return torch.where(mask, pooled, out)
+
+
+@functools.lru_cache(maxsize=None)
+def _int_pool_ok(device_str: str, dtype: torch.dtype = torch.uint8) -> bool:
+    """Probe (once per device/dtype) whether max_pool2d supports this integer
+    dtype natively — CPU does, CUDA builds generally don't. Pooling masks at
+    uint8 instead of float32 quarters the memory bandwidth of the dilation."""
+    try:
+        F.max_pool2d(torch.zeros((1, 1, 3, 3), dtype=dtype, device=device_str),
+                     kernel_size=3, stride=1, padding=1)
+        return True
+    except RuntimeError:
+        return False
+
+
+@_maybe_compile
+def _fill_step(seed: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+    pooled = F.max_pool2d(seed, kernel_size=3, stride=1, padding=1)
+    return torch.bitwise_and(pooled > 0, mask).to(seed.dtype)
+
+
+@_maybe_compile
+def _dilate_step(x: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+    pooled = F.max_pool2d(x, kernel_size=3, stride=1, padding=1)
+    return torch.where(mask, pooled, x)
+
+
+@_maybe_compile
+def _expand_step(labeled_image: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    # One pool serves both purposes: background pixels with a foreground
+    # neighbour (pooled > 0) are exactly the pixels the old
+    # find_hard_boundaries + masked-scatter formulation dilated into, so
+    # the second full-tensor pool and the gather/scatter are gone.
+    pooled = F.max_pool2d(labeled_image.float(), kernel_size=3, stride=1, padding=1)
+    expand_into = (labeled_image == 0) & (pooled > 0)
+    return torch.where(expand_into, pooled.to(labeled_image.dtype), labeled_image), expand_into
+
 
 def connected_components(x: torch.Tensor, num_iterations: int = 32) -> torch.Tensor:
     """
@@ -523,13 +779,19 @@ def connected_components(x: torch.Tensor, num_iterations: int = 32) -> torch.Ten
     mask = x == 1
 
     B, _, H, W = x.shape
-    out = torch.arange(B * W * H, device=x.device, dtype=x.dtype).reshape((B, 1, H, W))
-    out[~mask] = 0
+    # Work in float throughout (cast back once at return) so the pool doesn't
+    # re-cast per iteration; float32 is exact for ids below 2^24.
+    work_dtype = torch.float32 if B * H * W < (1 << 24) else torch.float64
+    out = torch.arange(B * W * H, device=x.device, dtype=work_dtype).reshape((B, 1, H, W))
+    out = torch.where(mask, out, torch.zeros_like(out))
 
     for _ in range(num_iterations):
-        out[mask] = F.max_pool2d(out, kernel_size=3, stride=1, padding=1)[mask]
+        new_out = _cc_step(out, mask)
+        if torch.equal(new_out, out):
+            break
+        out = new_out
 
-    return out
+    return out.to(x.dtype)
 
 
 def iou_heatmap(x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
@@ -556,18 +818,65 @@ def iou_heatmap(x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
     return map
 
 
+@functools.lru_cache(maxsize=32)
+def _mesh(h: int, w: int, device_str: str) -> torch.Tensor:
+    """Memoized (2,H,W) stack of row/column index grids.
+
+    Tiled postprocessing calls the functions below thousands of times with the
+    same tile shape, so the O(H*W) grid is built once per (shape, device) and
+    reused. The cached tensor is shared: callers must treat it as read-only.
+    """
+    grid_y, grid_x = torch.meshgrid(
+        torch.arange(h, device=device_str, dtype=torch.float32),
+        torch.arange(w, device=device_str, dtype=torch.float32), indexing="ij")
+    return torch.stack((grid_y, grid_x))
+
+
 def centroids_from_lab(lab: torch.Tensor):
-    mesh_grid = torch.stack(torch.meshgrid(torch.arange(lab.shape[-2], device = lab.device), torch.arange(lab.shape[-1],device = lab.device), indexing="ij")).float()
+    # One unique() scan plus three bincounts over the flat label map replace
+    # the sparse onehot + two SpGEMMs: coordinate sums and pixel counts come
+    # straight from weighted histograms over the inverse indices.
+    mesh = _mesh(lab.shape[-2], lab.shape[-1], str(lab.device))
 
-    sparse_onehot, label_ids = torch_sparse_onehot(lab, flatten=True)
+    label_ids, inverse = torch.unique(lab, sorted=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    num_labels = label_ids.shape[0]
 
-    sum_centroids = torch.sparse.mm(sparse_onehot, mesh_grid.flatten(1).T)
+    counts = torch.bincount(inverse, minlength=num_labels).float()
+    sum_y = torch.bincount(inverse, weights=mesh[0].reshape(-1), minlength=num_labels)
+    sum_x = torch.bincount(inverse, weights=mesh[1].reshape(-1), minlength=num_labels)
 
-    centroids = sum_centroids / torch.sparse.sum(sparse_onehot, dim=(1,)).to_dense().unsqueeze(-1)
+    centroids = torch.stack((sum_y, sum_x), dim=1) / counts.unsqueeze(-1)
+    if label_ids[0] == 0:  # background carries no centroid row
+        centroids = centroids[1:]
 
     return centroids, label_ids  # N,2  N
 
 
+@functools.lru_cache(maxsize=1)
+def _numba_crop():
+    """Lazily compile the CPU patch-crop kernel. numba is an optional
+    dependency: returns None when it is not installed and callers fall back to
+    the torch gather."""
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(parallel=True)
+    def crop(image, tops, lefts, patch, out):
+        # image: C,H,W ; out: N,C,patch,patch ; tops/lefts: N
+        for i in numba.prange(tops.shape[0]):
+            y0 = tops[i]
+            x0 = lefts[i]
+            for c in range(image.shape[0]):
+                for dy in range(patch):
+                    for dx in range(patch):
+                        out[i, c, dy, dx] = image[c, y0 + dy, x0 + dx]
+
+    return crop
+
+
 def get_patches(lab: torch.Tensor, image: torch.Tensor, patch_size: int = 64, return_lab_ids: bool = False):
     # lab is 1,H,W with N objects
     # image is C,H,W
@@ -588,22 +897,26 @@ def get_patches(lab: torch.Tensor, image: torch.Tensor, patch_size: int = 64, re
 
     slice_size = window_size * 2
 
-    # Create grids of indices for slice windows
-    grid_x, grid_y = torch.meshgrid(
-        torch.arange(slice_size, device=image.device),
-        torch.arange(slice_size, device=image.device), indexing="ij")
-    mesh = torch.stack((grid_x, grid_y))
-
-    mesh_grid = mesh.expand(N, 2, slice_size, slice_size)  # N,2,2*window_size,2*window_size
-    mesh_flat = torch.flatten(mesh_grid, 2).permute(1, 0, -1)  # 2,N,2*window_size*2*window_size
-    idx = window_slices[:, 0].permute(1, 0)[:, :, None]
-    mesh_flat = mesh_flat + idx
-    mesh_flater = torch.flatten(mesh_flat, 1)  # 2,N*2*window_size*2*window_size
-
+    crop = _numba_crop() if image.device.type == "cpu" and not image.requires_grad else None
+    if crop is not None:
+        # CPU fast path: the JIT kernel writes each patch straight into the
+        # output, fusing index construction with the crop — no index tensors
+        # and one parallel pass over the objects.
+        image_np = image.detach().numpy()
+        out_np = np.empty((N, C, slice_size, slice_size), dtype=image_np.dtype)
+        crop(image_np, window_slices[:, 0, 0].numpy(), window_slices[:, 0, 1].numpy(),
+             slice_size, out_np)
+        out = torch.from_numpy(out_np)
+    else:
+        # Row/column indices broadcast to N,slice_size each; advanced indexing
+        # with ys[:,:,None] and xs[:,None,:] gathers all patches at once without
+        # ever materialising the old 2,N*slice_size*slice_size index mesh.
+        offsets = torch.arange(slice_size, device=image.device)
+        ys = window_slices[:, 0, 0, None] + offsets  # N,slice_size
+        xs = window_slices[:, 0, 1, None] + offsets  # N,slice_size
 
-    out = image[:, mesh_flater[0], mesh_flater[1]].reshape(C, N, -1)
-    out = out.reshape(C, N, patch_size, patch_size)
-    out = out.permute(1, 0, 2, 3)
+        out = image[:, ys[:, :, None], xs[:, None, :]]  # C,N,slice_size,slice_size
+        out = out.permute(1, 0, 2, 3)
 
 
     if return_lab_ids:
@@ -644,10 +957,10 @@ def eccentricity_batch(mask_tensor):
     # Get dimensions
     batch_size, m, n = mask_tensor.shape
     
-    # Create indices grid
-    y_indices, x_indices = torch.meshgrid(torch.arange(m), torch.arange(n), indexing='ij')
-    y_indices = y_indices.unsqueeze(0).to(mask_tensor.device).expand(batch_size, m, n)
-    x_indices = x_indices.unsqueeze(0).to(mask_tensor.device).expand(batch_size, m, n)
+    # Fetch the cached index grids; broadcasting against B,H,W is free, so no
+    # explicit expand is needed.
+    mesh = _mesh(m, n, str(mask_tensor.device))
+    y_indices, x_indices = mesh[0], mesh[1]
     
     # Find total mass and centroid
     total_mass = mask_tensor.sum(dim=(1, 2))
@@ -661,23 +974,18 @@ def eccentricity_batch(mask_tensor):
     M_xx = torch.sum(x_diff**2 * mask_tensor, dim=(1, 2))
     M_xy = torch.sum(x_diff * y_diff * mask_tensor, dim=(1, 2))
 
-    # Construct second-order moments tensor
-    moments_tensor = torch.stack([torch.stack([M_xx, M_xy]),
-                                  torch.stack([M_xy, M_yy])]).permute(2,0,1)
-    
-
-    # Compute eigenvalues
-    eigenvalues = torch.linalg.eigvals(moments_tensor)
+    # Eigenvalues of the symmetric 2x2 moment matrix in closed form:
+    # lambda = mean +- sqrt(((M_xx - M_yy)/2)^2 + M_xy^2). No complex
+    # batched eigensolver needed.
+    mean = (M_xx + M_yy) / 2
+    disc = torch.sqrt(((M_xx - M_yy) / 2) ** 2 + M_xy ** 2)
+    lambda1 = mean + disc
+    lambda2 = mean - disc
 
-    # Get maximum eigenvalue
-    lambda1 = torch.max(eigenvalues.real, dim=1).values
-    # Get minimum eigenvalue
-    lambda2 = torch.min(eigenvalues.real, dim=1).values
-    
     # Calculate eccentricity
     eccentricity = torch.sqrt(1 - (lambda2 / lambda1))
-    
-    return eccentricity.squeeze(1,2)
+
+    return eccentricity
 
 
 
@@ -763,14 +1071,19 @@ def _to_tensor_float32(image: Union[np.ndarray, torch.Tensor]) -> torch.Tensor:
 from instanseg.utils.utils import show_images
 def flood_fill(bw_mask: torch.Tensor, bw_seed: torch.Tensor):
 
-    bw_mask = _to_ndim(bw_mask, 4).clone().float()
-    bw_seed = _to_ndim(bw_seed, 4).clone()
-    
+    bw_mask = _to_ndim(bw_mask, 4) > 0
+    # Pool at uint8 where the backend allows it; float32 carries no extra
+    # information for a binary seed, only 4x the bandwidth.
+    work_dtype = torch.uint8 if _int_pool_ok(str(bw_mask.device)) else torch.float32
+    bw_seed = (_to_ndim(bw_seed, 4) > 0).to(work_dtype)
+
     max_iterations = max(bw_seed.shape[-1], bw_seed.shape[-2])
     for ii in range(max_iterations):
-        bw_seed2 = torch.nn.functional.max_pool2d(bw_seed.float(), kernel_size=3, stride=1, padding=1)
-        bw_seed2 = torch.bitwise_and(bw_seed2 > 0, bw_mask > 0)
-        if torch.equal(bw_seed, bw_seed2):
+        bw_seed2 = _fill_step(bw_seed, bw_mask)
+        # Poll convergence only every 8 iterations: torch.equal is a full
+        # H*W reduction with a device sync, which dominates per-iter latency
+        # on CUDA. Worst case costs 7 no-op iterations past the fixed point.
+        if (ii % 8 == 7 or ii == max_iterations - 1) and torch.equal(bw_seed, bw_seed2):
             return bw_seed2 > 0
         bw_seed = bw_seed2
     print('Reached maximum number of iterations - this is not expected!')
@@ -785,19 +1098,27 @@ def fill_holes(bw_mask: torch.Tensor):
 
 def dilate(x: torch.Tensor, mask, num_iterations: int = 3) -> torch.Tensor:
     original_dim = x.dim()
-    x = _to_ndim(x, 4).float()
-    mask = _to_ndim(mask, 4)
+    if x.dtype == torch.bool and _int_pool_ok(str(x.device)):
+        x = _to_ndim(x, 4).to(torch.uint8)
+    else:
+        x = _to_ndim(x, 4).float()
+    mask = _to_ndim(mask, 4).bool()
 
     for _ in range(num_iterations):
-        x[mask] = torch.nn.functional.max_pool2d(x.float(), kernel_size=3, stride=1, padding=1)[mask]
+        x = _dilate_step(x, mask)
     return _to_ndim(x, original_dim)
 
 def find_boundaries_max_pool_labeled(labeled_image: torch.Tensor) -> torch.Tensor:
-    labeled_image = _to_ndim(labeled_image, 4).float()
-    max_pooled = F.max_pool2d(labeled_image.float(), kernel_size=3, stride=1, padding=1)
+    labeled_image = _to_ndim(labeled_image, 4)
+    # Pool integer label maps at their native dtype where supported; the
+    # float32 round-trip was pure bandwidth. float16 is not an option here:
+    # it only represents integers exactly up to 2048.
+    if labeled_image.dtype.is_floating_point or not _int_pool_ok(
+            str(labeled_image.device), labeled_image.dtype):
+        labeled_image = labeled_image.float()
+    max_pooled = F.max_pool2d(labeled_image, kernel_size=3, stride=1, padding=1)
     # Boundaries are where the max-pooled result differs from the original labels
-    boundaries = (max_pooled != labeled_image.float()).float()
-    return boundaries > 0
+    return max_pooled != labeled_image
 
 def find_hard_boundaries(labeled_image: torch.Tensor) -> torch.Tensor:
     all_boundaries = find_boundaries_max_pool_labeled(labeled_image)
@@ -809,8 +1130,9 @@ def expand_labels_map(labeled_image: torch.Tensor, num_iterations: int = 5) -> t
     original_dim = labeled_image.dim()
     labeled_image = _to_ndim(labeled_image, 4)
     for _ in range(num_iterations):
-        valid_region = (~ find_hard_boundaries(labeled_image))
-        labeled_image[valid_region] = F.max_pool2d(labeled_image.float(), kernel_size=3, stride=1, padding=1)[valid_region]
+        labeled_image, expand_into = _expand_step(labeled_image)
+        if not expand_into.any():
+            break
     labeled_image = _to_ndim(labeled_image, original_dim)
 
     return labeled_image
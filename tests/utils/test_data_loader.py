@@ -0,0 +1,61 @@
+"""Tests for dataset loading helpers in instanseg.utils.data_loader"""
+
+import numpy as np
+import pytest
+import tifffile
+
+from instanseg.utils.data_loader import (
+    LazyImage,
+    _decode_tiff,
+)
+
+
+class TestDecodeTiff:
+    """Tests for _decode_tiff"""
+
+    @pytest.mark.parametrize("direct_io", [False, True])
+    def test_multipage_matches_tifffile(self, tmp_path, direct_io):
+        # Channel-first multi-page stack: the layout written by
+        # export_dataset_dict_as_folder.
+        img = np.random.rand(2, 16, 16).astype(np.float32)
+        path = tmp_path / "stack.tiff"
+        tifffile.imwrite(path, img)
+        result = _decode_tiff(path, direct_io=direct_io)
+        assert result.shape == (2, 16, 16)
+        np.testing.assert_array_equal(result, tifffile.imread(path))
+
+    @pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.int32])
+    def test_multipage_dtypes(self, tmp_path, dtype):
+        img = np.arange(2 * 16 * 16, dtype=dtype).reshape(2, 16, 16)
+        path = tmp_path / "typed.tiff"
+        tifffile.imwrite(path, img)
+        np.testing.assert_array_equal(_decode_tiff(path), img)
+
+    def test_single_page_matches_tifffile(self, tmp_path):
+        img = (np.random.rand(16, 16) * 255).astype(np.uint8)
+        path = tmp_path / "flat.tiff"
+        tifffile.imwrite(path, img)
+        np.testing.assert_array_equal(_decode_tiff(path), tifffile.imread(path))
+
+
+class TestLazyImage:
+    """Tests for LazyImage path-backed handles"""
+
+    def test_shape_multipage(self, tmp_path):
+        img = np.random.rand(2, 16, 16).astype(np.float32)
+        tifffile.imwrite(tmp_path / "img.tiff", img)
+        handle = LazyImage("img.tiff", data_path=str(tmp_path))
+        assert handle.shape == (2, 16, 16)
+
+    def test_shape_single_page(self, tmp_path):
+        img = np.zeros((16, 16), dtype=np.uint16)
+        tifffile.imwrite(tmp_path / "mask.tiff", img)
+        handle = LazyImage("mask.tiff", data_path=str(tmp_path))
+        assert handle.shape == (16, 16)
+
+    def test_load_roundtrip(self, tmp_path):
+        img = np.random.rand(2, 16, 16).astype(np.float32)
+        tifffile.imwrite(tmp_path / "img.tiff", img)
+        handle = LazyImage("img.tiff", data_path=str(tmp_path))
+        np.testing.assert_array_equal(handle.load(), img)
+        np.testing.assert_array_equal(np.asarray(handle), img)
@@ -12,6 +12,8 @@ from instanseg.utils.pytorch_utils import (
     _to_tensor_float32,
     _to_ndim,
     connected_components,
+    match_labels,
+    batched_match_labels,
 )
 
 
@@ -190,3 +192,46 @@ class TestConnectedComponents:
         assert len(unique1) == 1  # One connected component
         assert len(unique2) == 2  # Two separate components
 
+
+
+class TestBatchedMatchLabels:
+    """Tests for batched_match_labels against the per-pair reference"""
+
+    @staticmethod
+    def _tile_pair(shift):
+        t1 = torch.zeros((1, 32, 32), dtype=torch.int64)
+        t2 = torch.zeros_like(t1)
+        # overlapping objects (matched for small shifts, unmatched for large)
+        t1[0, 2:10, 2:10] = 7
+        t2[0, 2 + shift:10 + shift, 2:10] = 3
+        # exactly coincident objects with different ids
+        t1[0, 20:30, 20:30] = 2
+        t2[0, 20:30, 20:30] = 9
+        # objects present on one side only
+        t1[0, 12:16, 12:16] = 5
+        t2[0, 0:3, 20:28] = 12
+        return t1, t2
+
+    @pytest.mark.parametrize("strict", [False, True])
+    def test_matches_per_pair_reference(self, strict):
+        pairs = [self._tile_pair(shift) for shift in (0, 1, 6)]
+        # a pair with no overlap at all, on a different tile size
+        t1 = torch.zeros((1, 16, 16), dtype=torch.int64)
+        t2 = torch.zeros_like(t1)
+        t1[0, 0:4, 0:4] = 1
+        t2[0, 10:14, 10:14] = 2
+        pairs.append((t1, t2))
+        # pairs with an empty tile keep the per-pair semantics
+        pairs.append((torch.zeros((1, 16, 16), dtype=torch.int64),
+                      torch.ones((1, 16, 16), dtype=torch.int64)))
+        pairs.append((torch.ones((1, 16, 16), dtype=torch.int64),
+                      torch.zeros((1, 16, 16), dtype=torch.int64)))
+
+        batched = batched_match_labels([(a.clone(), b.clone()) for a, b in pairs],
+                                       strict=strict)
+
+        assert len(batched) == len(pairs)
+        for (t1, t2), (b1, b2) in zip(pairs, batched):
+            e1, e2 = match_labels(t1.clone(), t2.clone(), strict=strict)
+            torch.testing.assert_close(b1, e1)
+            torch.testing.assert_close(b2, e2)